@@ -20,6 +20,7 @@ import copy
 import io
 import os
 import re
+import tempfile
 import unittest
 from textfsm import clitable
 
@@ -68,20 +69,45 @@ class UnitTestIndexTable(unittest.TestCase):
     self.assertEqual(1, indx.GetRowMatch({'Hostname': 'abc'}))
     self.assertEqual(2, indx.GetRowMatch({'Hostname': 'abc',
                                           'Vendor': 'VendorB'}))
+    # Literal columns retain regexp semantics, matching on the prefix.
+    self.assertEqual(2, indx.GetRowMatch({'Vendor': 'VendorBC'}))
+    self.assertEqual(0, indx.GetRowMatch({'Vendor': 'Vendor'}))
+    self.assertEqual(0, indx.GetRowMatch({'Vendor': 'VendorC'}))
+    # Attributes not in the index are ignored.
+    self.assertEqual(1, indx.GetRowMatch({'Bogus': 'abc'}))
+    # Repeated lookups, served from the match cache, give the same rows.
+    for _ in range(2):
+      self.assertEqual(2, indx.GetRowMatch({'Vendor': 'VendorB'}))
+      self.assertEqual(0, indx.GetRowMatch({'Vendor': 'VendorC'}))
+    # Many distinct lookups still match correctly once the cache is full.
+    for i in range(clitable._MATCH_CACHE_SIZE + 10):
+      self.assertEqual(1, indx.GetRowMatch({'Hostname': 'host%d' % i}))
+    self.assertEqual(2, indx.GetRowMatch({'Hostname': 'abc',
+                                          'Vendor': 'VendorB'}))
 
   def testCopy(self):
     """Tests copy of IndexTable object."""
     file_path = os.path.join('testdata', 'parseindex_index')
     indx = clitable.IndexTable(file_path=file_path)
-    copy.deepcopy(indx)
+    clone = copy.deepcopy(indx)
+    self.assertIsNot(indx.index, clone.index)
+    self.assertEqual(indx.index.table, clone.index.table)
+    # Compiled regexps are immutable and so are shared.
+    self.assertIs(indx.compiled, clone.compiled)
 
 
 class UnitTestCliTable(unittest.TestCase):
   """Tests the CliTable class."""
 
+  @classmethod
+  def setUpClass(cls):
+    super(UnitTestCliTable, cls).setUpClass()
+    # Parse the index once, each test's CliTable reuses the class level cache.
+    clitable.CliTable.INDEX = {}
+    clitable.CliTable('default_index', 'testdata')
+
   def setUp(self):
     super(UnitTestCliTable, self).setUp()
-    clitable.CliTable.INDEX = {}
     self.clitable = clitable.CliTable('default_index', 'testdata')
     self.input_data = ('a b c\n'
                        'd e f\n')
@@ -106,8 +132,30 @@ class UnitTestCliTable(unittest.TestCase):
 
   def testRepeatRead(self):
     """Tests that index file is read only once at the class level."""
+    # Start from an empty cache, the only test that needs to.
+    clitable.CliTable.INDEX = {}
+    first_clitable = clitable.CliTable('default_index', 'testdata')
     new_clitable = clitable.CliTable('default_index', 'testdata')
-    self.assertEqual(self.clitable.index, new_clitable.index)
+    self.assertIs(first_clitable.index, new_clitable.index)
+    # The cache is keyed by the index file's path.
+    fullpath = os.path.join('testdata', 'default_index')
+    self.assertIs(clitable.CliTable.INDEX[fullpath], new_clitable.index)
+    self.assertIsNot(self.clitable.index, new_clitable.index)
+
+  def testSubclassIndex(self):
+    """Tests that subclasses with their own pre-processing are not shared."""
+
+    class UpperCliTable(clitable.CliTable):
+
+      def _PreParse(self, key, value):
+        if key == 'Vendor':
+          return value.upper()
+        return super(UpperCliTable, self)._PreParse(key, value)
+
+    upper_clitable = UpperCliTable('default_index', 'testdata')
+    self.assertIsNot(self.clitable.index, upper_clitable.index)
+    self.assertEqual('VENDORA', upper_clitable.index.index[1]['Vendor'])
+    self.assertEqual('VendorA', self.clitable.index.index[1]['Vendor'])
 
   def testCliCompile(self):
     """Tests PreParse and PreCompile."""
@@ -142,16 +190,17 @@ class UnitTestCliTable(unittest.TestCase):
 
   def testParseCmdFromIndex(self):
     """Tests parsing with a template found in the index."""
-    self.clitable.ParseCmd(self.input_data,
-                           attributes={'Command': 'sh vers',
-                                       'Vendor': 'VendorB'})
-    self.assertEqual(
-        self.clitable.table, 'Col1, Col2, Col3\na, b, c\n')
-    self.clitable.ParseCmd(self.input_data,
-                           attributes={'Command': 'sh int',
-                                       'Vendor': 'VendorA'})
-    self.assertEqual(
-        self.clitable.table, 'Col1, Col2, Col3\nd, e, f\n')
+    # (attributes, expected table)
+    cases = (
+        ({'Command': 'sh vers', 'Vendor': 'VendorB'},
+         'Col1, Col2, Col3\na, b, c\n'),
+        ({'Command': 'sh int', 'Vendor': 'VendorA'},
+         'Col1, Col2, Col3\nd, e, f\n'),
+    )
+    for attributes, expected in cases:
+      with self.subTest(attributes=attributes):
+        self.clitable.ParseCmd(self.input_data, attributes=attributes)
+        self.assertEqual(self.clitable.table, expected)
 
     self.assertRaises(clitable.CliTableError, self.clitable.ParseCmd,
                       self.input_data,
@@ -181,6 +230,56 @@ class UnitTestCliTable(unittest.TestCase):
                       attributes={'Command': 'sh vers'},
                       templates='clitable_templateB:clitable_bogus')
 
+  def testTemplateCache(self):
+    """Tests that templates are compiled once and reused across parses."""
+    template_path = os.path.abspath(
+        os.path.join('testdata', 'clitable_templateB'))
+    clitable.CliTable._TEMPLATES.pop(template_path, None)
+    self.clitable.ParseCmd(self.input_data, templates='clitable_templateB')
+    cached = clitable.CliTable._TEMPLATES[template_path]
+    self.clitable.ParseCmd(self.input_data, templates='clitable_templateB')
+    self.assertIs(cached, clitable.CliTable._TEMPLATES[template_path])
+    self.assertEqual(self.clitable.table, 'Col1, Col4\na, b\nd, e\n')
+
+  def testTemplateCacheInvalidation(self):
+    """Tests that edited templates are recompiled, even at the same mtime."""
+    with tempfile.TemporaryDirectory() as template_dir:
+      template_path = os.path.join(template_dir, 'template')
+      with open(template_path, 'w') as f:
+        f.write(self.template)
+      stat = os.stat(template_path)
+      cli_table = clitable.CliTable(template_dir=template_dir)
+      cli_table.ParseCmd(self.input_data, templates='template')
+      self.assertEqual(cli_table.table,
+                       'Col1, Col2, Col3\na, b, c\nd, e, f\n')
+
+      with open(template_path, 'w') as f:
+        f.write(self.template.replace('Value Col3', 'Value Col33')
+                .replace('${Col3}', '${Col33}'))
+      os.utime(template_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+      cli_table.ParseCmd(self.input_data, templates='template')
+      self.assertEqual(cli_table.table,
+                       'Col1, Col2, Col33\na, b, c\nd, e, f\n')
+
+  def testTemplateCacheSize(self):
+    """Tests that the template cache is bounded."""
+    clitable.CliTable._TEMPLATES.clear()
+    for _ in range(clitable._TEMPLATE_CACHE_SIZE + 1):
+      clitable.CliTable._TEMPLATES[object()] = None
+    self.clitable.ParseCmd(self.input_data, templates='clitable_templateB')
+    self.assertEqual(clitable._TEMPLATE_CACHE_SIZE,
+                     len(clitable.CliTable._TEMPLATES))
+    clitable.CliTable._TEMPLATES.clear()
+
+  def testTemplateCacheNamedStream(self):
+    """Tests that named templates without a file descriptor still parse."""
+    self.template_file.name = 'named_stream'
+    self.clitable._TemplateNamesToFiles = lambda t: [self.template_file]
+    self.clitable.ParseCmd(self.input_data, attributes={'Command': 'sh ver'})
+    self.assertEqual(self.clitable.table,
+                     'Col1, Col2, Col3\na, b, c\nd, e, f\n')
+    self.assertNotIn('named_stream', clitable.CliTable._TEMPLATES)
+
   def testRequireCols(self):
     """Tests that CliTable expects a 'Template' row to be present."""
     self.assertRaises(clitable.CliTableError, clitable.CliTable,
@@ -278,7 +377,13 @@ class UnitTestCliTable(unittest.TestCase):
 
   def testCopy(self):
     """Tests copying of clitable object."""
-    copy.deepcopy(self.clitable)
+    self.clitable.ParseCmd(self.input_data, attributes={'Command': 'sh vers'})
+    clone = copy.deepcopy(self.clitable)
+    # The class level index is shared, the parsed rows are not.
+    self.assertIs(self.clitable.index, clone.index)
+    self.assertEqual(self.clitable.table, clone.table)
+    self.assertIsNot(self.clitable[1], clone[1])
+    self.assertIs(clone, clone[1].table)
 
 
 if __name__ == '__main__':
@@ -127,12 +127,14 @@ class PagerTest(unittest.TestCase):
     sys.stdout = FakeTerminal()
     self.get_ch_orig = terminal.Pager._GetCh
     terminal.Pager._GetCh = lambda self: 'q'
+    self._get_terminal_size_orig = terminal.shutil.get_terminal_size
 
     self.p = terminal.Pager()
 
   def tearDown(self):
     super(PagerTest, self).tearDown()
     terminal.Pager._GetCh = self.get_ch_orig
+    terminal.shutil.get_terminal_size = self._get_terminal_size_orig
     sys.stdout = sys.__stdout__
 
   def testPager(self):
@@ -158,6 +160,33 @@ class PagerTest(unittest.TestCase):
     self.p.Page()
     self.assertEqual(20, sys.stdout.CountLines())
 
+  def testPageIncremental(self):
+    terminal.shutil.get_terminal_size = lambda: (80, 100)
+    self.p = terminal.Pager()
+    self.p.Page('a' * 101 + '\n')
+    self.assertEqual(2, sys.stdout.CountLines())
+    # A partial line is shown, then re-wrapped once it is completed.
+    self.p.Page('b' * 10)
+    self.p.Page('b' * 80 + '\n')
+    self.assertEqual(
+        terminal.LineWrap(self.p._text).splitlines(), self.p._WrappedLines()
+    )
+    self.assertEqual(['a' * 80, 'a' * 21, 'b' * 80, 'b' * 10],
+                     self.p._WrappedLines())
+
+  def testPageResize(self):
+    terminal.shutil.get_terminal_size = lambda: (80, 100)
+    self.p = terminal.Pager()
+    self.p.Page('a' * 101 + '\n')
+    self.assertEqual(2, len(self.p._WrappedLines()))
+    # Text already wrapped is wrapped again at the new width.
+    terminal.shutil.get_terminal_size = lambda: (40, 100)
+    self.assertEqual(['a' * 40, 'a' * 40, 'a' * 21], self.p._WrappedLines())
+    # As it is when the screen size is set again.
+    self.p._wrapped_lines.append('stale')
+    self.p.SetLines(None)
+    self.assertEqual(3, len(self.p._WrappedLines()))
+
 
 if __name__ == '__main__':
   unittest.main()
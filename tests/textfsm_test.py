@@ -17,15 +17,66 @@
 
 """Unittest for textfsm module."""
 
+import copy
 import io
+import re
 import unittest
 
 import textfsm
 
+_OPTIONS = textfsm.TextFSMOptions
+
+# Templates shared by testParseText and testParseTextToDicts.
+_TWO_VAR_TEMPLATE = (
+    'Value Required boo (one)\nValue Filldown hoo (two)\n\n'
+    'Start\n  ^$boo -> Next.Record\n  ^$hoo -> Next.Record\n\n'
+    'EOF\n'
+)
+_MULTI_VAR_TEMPLATE = (
+    'Value Required,Filldown boo (one)\n'
+    'Value Filldown,Required hoo (two)\n\n'
+    'Start\n  ^$boo -> Next.Record\n  ^$hoo -> Next.Record\n\n'
+    'EOF\n'
+)
+
+# Expected results of the larger parsing tests.
+_LIST_RESULT = [[['one'], 'two'], [['on0'], 'tw0']]
+_LIST_FILLDOWN_RESULT = [
+    [['one'], 'one'],
+    [['one', 'on0'], 'on0'],
+    [['one', 'on0', 'on1'], 'on1'],
+]
+_LIST_REQUIRED_RESULT = [[['one'], 'two']]
+_NESTED_MATCHING_RESULT = [[
+    [
+        {'name': 'Bob', 'age': '32', 'state': 'NC'},
+        {'name': 'Alice', 'age': '27', 'state': 'NY'},
+        {'name': 'Jeff', 'age': '45', 'state': 'CA'},
+    ],
+    'Julia',
+]]
+_FILLUP_RESULT = [['1', 'A2', 'B1'], ['2', 'A2', 'B3'], ['3', '', 'B3']]
+
 
 class UnitTestFSM(unittest.TestCase):
   """Tests the FSM engine."""
 
+  @classmethod
+  def setUpClass(cls):
+    super(UnitTestFSM, cls).setUpClass()
+    # FSMs keyed by template, shared by the tests that only parse text.
+    cls._fsms = {}
+
+  def _GetFSM(self, tplt):
+    """Returns a reset FSM for the template, compiling each template once."""
+    fsm = self._fsms.get(tplt)
+    if fsm is None:
+      fsm = textfsm.TextFSM(io.StringIO(tplt))
+      self._fsms[tplt] = fsm
+    else:
+      fsm.Reset()
+    return fsm
+
   def testFSMValue(self):
     # Check basic line is parsed.
     line = r'Value beer (\S+)'
@@ -38,14 +89,14 @@ class UnitTestFSM(unittest.TestCase):
 
     # Test options
     line = r'Value Filldown,Required beer (\S+)'
-    v = textfsm.TextFSMValue(options_class=textfsm.TextFSMOptions)
+    v = textfsm.TextFSMValue(options_class=_OPTIONS)
     v.Parse(line)
     self.assertEqual(v.name, 'beer')
     self.assertEqual(v.regex, r'(\S+)')
     self.assertEqual(v.OptionNames(), ['Filldown', 'Required'])
 
     # Multiple parenthesis.
-    v = textfsm.TextFSMValue(options_class=textfsm.TextFSMOptions)
+    v = textfsm.TextFSMValue(options_class=_OPTIONS)
     v.Parse('Value Required beer (boo(hoo))')
     self.assertEqual(v.name, 'beer')
     self.assertEqual(v.regex, '(boo(hoo))')
@@ -53,44 +104,38 @@ class UnitTestFSM(unittest.TestCase):
     self.assertEqual(v.OptionNames(), ['Required'])
 
     # regex must be bounded by parenthesis.
-    self.assertRaises(
-        textfsm.TextFSMTemplateError, v.Parse, 'Value beer (boo(hoo)))boo'
-    )
-    self.assertRaises(
-        textfsm.TextFSMTemplateError, v.Parse, 'Value beer boo(boo(hoo)))'
-    )
-    self.assertRaises(
-        textfsm.TextFSMTemplateError, v.Parse, 'Value beer (boo)hoo)'
-    )
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      v.Parse('Value beer (boo(hoo)))boo')
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      v.Parse('Value beer boo(boo(hoo)))')
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      v.Parse('Value beer (boo)hoo)')
 
     # Escaped parentheses don't count.
-    v = textfsm.TextFSMValue(options_class=textfsm.TextFSMOptions)
+    v = textfsm.TextFSMValue(options_class=_OPTIONS)
     v.Parse(r'Value beer (boo\)hoo)')
     self.assertEqual(v.name, 'beer')
     self.assertEqual(v.regex, r'(boo\)hoo)')
-    self.assertRaises(
-        textfsm.TextFSMTemplateError, v.Parse, r'Value beer (boohoo\)'
-    )
-    self.assertRaises(
-        textfsm.TextFSMTemplateError, v.Parse, r'Value beer (boo)hoo\)'
-    )
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      v.Parse(r'Value beer (boohoo\)')
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      v.Parse(r'Value beer (boo)hoo\)')
 
     # Unbalanced parenthesis can exist if within square "[]" braces.
-    v = textfsm.TextFSMValue(options_class=textfsm.TextFSMOptions)
+    v = textfsm.TextFSMValue(options_class=_OPTIONS)
     v.Parse('Value beer (boo[(]hoo)')
     self.assertEqual(v.name, 'beer')
     self.assertEqual(v.regex, '(boo[(]hoo)')
 
     # Escaped braces don't count.
-    self.assertRaises(
-        textfsm.TextFSMTemplateError, v.Parse, r'Value beer (boo\[)\]hoo)'
-    )
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      v.Parse(r'Value beer (boo\[)\]hoo)')
 
     # String function.
-    v = textfsm.TextFSMValue(options_class=textfsm.TextFSMOptions)
+    v = textfsm.TextFSMValue(options_class=_OPTIONS)
     v.Parse('Value Required beer (boo(hoo))')
     self.assertEqual(str(v), 'Value Required beer (boo(hoo))')
-    v = textfsm.TextFSMValue(options_class=textfsm.TextFSMOptions)
+    v = textfsm.TextFSMValue(options_class=_OPTIONS)
     v.Parse(r'Value Required,Filldown beer (bo\S+(hoo))')
     self.assertEqual(str(v), r'Value Required,Filldown beer (bo\S+(hoo))')
 
@@ -103,6 +148,9 @@ class UnitTestFSM(unittest.TestCase):
     self.assertEqual(r.line_op, '')
     self.assertEqual(r.new_state, '')
     self.assertEqual(r.record_op, '')
+    # Compiled regexps are used directly and are copyable.
+    self.assertIsInstance(r.regex_obj, re.Pattern)
+    self.assertIs(r.regex_obj, copy.deepcopy(r).regex_obj)
     # Multiple matches
     line = '  ^A $hi called ${beer}'
     r = textfsm.TextFSMRule(line)
@@ -136,38 +184,30 @@ class UnitTestFSM(unittest.TestCase):
     self.assertEqual(r.record_op, 'NoRecord')
 
     # Bad syntax tests.
-    self.assertRaises(
-        textfsm.TextFSMTemplateError,
-        textfsm.TextFSMRule,
-        '  ^A beer called ${beer} -> Next Next Next',
-    )
-    self.assertRaises(
-        textfsm.TextFSMTemplateError,
-        textfsm.TextFSMRule,
-        '  ^A beer called ${beer} -> Boo.hoo',
-    )
-    self.assertRaises(
-        textfsm.TextFSMTemplateError,
-        textfsm.TextFSMRule,
-        '  ^A beer called ${beer} -> Continue.Record $Hi',
-    )
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      textfsm.TextFSMRule('  ^A beer called ${beer} -> Next Next Next')
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      textfsm.TextFSMRule('  ^A beer called ${beer} -> Boo.hoo')
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      textfsm.TextFSMRule('  ^A beer called ${beer} -> Continue.Record $Hi')
 
   def testRulePrefixes(self):
     """Test valid and invalid rule prefixes."""
 
+    header = 'Value unused (.)\n\nStart\n'
+
     # Bad syntax tests.
     for prefix in (' ', '.^', ' \t', ''):
-      f = io.StringIO(
-          'Value unused (.)\n\nStart\n' + prefix + 'A simple string.'
-      )
-      self.assertRaises(textfsm.TextFSMTemplateError, textfsm.TextFSM, f)
+      with self.subTest(prefix=prefix):
+        f = io.StringIO(header + prefix + 'A simple string.')
+        with self.assertRaises(textfsm.TextFSMTemplateError):
+          textfsm.TextFSM(f)
 
     # Good syntax tests.
     for prefix in (' ^', '  ^', '\t^'):
-      f = io.StringIO(
-          'Value unused (.)\n\nStart\n' + prefix + 'A simple string.'
-      )
-      self.assertIsNotNone(textfsm.TextFSM(f))
+      with self.subTest(prefix=prefix):
+        f = io.StringIO(header + prefix + 'A simple string.')
+        self.assertIsNotNone(textfsm.TextFSM(f))
 
   def testImplicitDefaultRules(self):
 
@@ -187,7 +227,8 @@ class UnitTestFSM(unittest.TestCase):
         '  ^A beer called ${beer} -> Continue End',
         '  ^A beer called ${beer} -> Beer End',
     ):
-      self.assertRaises(textfsm.TextFSMTemplateError, textfsm.TextFSMRule, line)
+      with self.assertRaises(textfsm.TextFSMTemplateError):
+        textfsm.TextFSMRule(line)
 
   def testSpacesAroundAction(self):
     for line in (
@@ -230,11 +271,13 @@ class UnitTestFSM(unittest.TestCase):
     t._line_num = 0
     f = io.StringIO(buf)
     t._ParseFSMVariables(f)
-    self.assertEqual(str(t._GetValue('Beer')), 'Value Filldown Beer (beer)')
-    self.assertEqual(
-        str(t._GetValue('Spirits')), 'Value Required Spirits (whiskey)'
-    )
-    self.assertEqual(str(t._GetValue('Wine')), 'Value Filldown Wine (claret)')
+    expected = {
+        'Beer': 'Value Filldown Beer (beer)',
+        'Spirits': 'Value Required Spirits (whiskey)',
+        'Wine': 'Value Filldown Wine (claret)',
+    }
+    for name, value in expected.items():
+      self.assertEqual(str(t._GetValue(name)), value)
 
     # Multiple variables.
     buf = (
@@ -248,23 +291,28 @@ class UnitTestFSM(unittest.TestCase):
 
     f = io.StringIO(buf)
     t._ParseFSMVariables(f)
-    self.assertEqual(str(t._GetValue('Beer')), 'Value Filldown Beer (beer)')
-    self.assertEqual(str(t._GetValue('Spirits')), 'Value Spirits ()')
-    self.assertEqual(
-        str(t._GetValue('Wine')), 'Value Filldown,Required Wine ((c|C)laret)'
-    )
+    expected = {
+        'Beer': 'Value Filldown Beer (beer)',
+        'Spirits': 'Value Spirits ()',
+        'Wine': 'Value Filldown,Required Wine ((c|C)laret)',
+    }
+    for name, value in expected.items():
+      self.assertEqual(str(t._GetValue(name)), value)
 
     # Malformed variables.
     buf = 'Value Beer (beer) beer'
     f = io.StringIO(buf)
-    self.assertRaises(textfsm.TextFSMTemplateError, t._ParseFSMVariables, f)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      t._ParseFSMVariables(f)
 
     buf = 'Value Filldown, Required Spirits ()'
     f = io.StringIO(buf)
-    self.assertRaises(textfsm.TextFSMTemplateError, t._ParseFSMVariables, f)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      t._ParseFSMVariables(f)
     buf = 'Value filldown,Required Wine ((c|C)laret)'
     f = io.StringIO(buf)
-    self.assertRaises(textfsm.TextFSMTemplateError, t._ParseFSMVariables, f)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      t._ParseFSMVariables(f)
 
     # Values that look bad but are OK.
     buf = (
@@ -277,15 +325,13 @@ class UnitTestFSM(unittest.TestCase):
     )
     f = io.StringIO(buf)
     t._ParseFSMVariables(f)
-    self.assertEqual(
-        str(t._GetValue('Beer')), 'Value Filldown Beer (bee(r), (and) (M)ead$)'
-    )
-    self.assertEqual(
-        str(t._GetValue('Spirits,and,some')), 'Value Spirits,and,some ()'
-    )
-    self.assertEqual(
-        str(t._GetValue('Wine')), 'Value Filldown,Required Wine ((c|C)laret)'
-    )
+    expected = {
+        'Beer': 'Value Filldown Beer (bee(r), (and) (M)ead$)',
+        'Spirits,and,some': 'Value Spirits,and,some ()',
+        'Wine': 'Value Filldown,Required Wine ((c|C)laret)',
+    }
+    for name, value in expected.items():
+      self.assertEqual(str(t._GetValue(name)), value)
 
     # Variable name too long.
     buf = (
@@ -294,7 +340,8 @@ class UnitTestFSM(unittest.TestCase):
         '(beer)\n\n'
     )
     f = io.StringIO(buf)
-    self.assertRaises(textfsm.TextFSMTemplateError, t._ParseFSMVariables, f)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      t._ParseFSMVariables(f)
 
   def testParseFSMState(self):
 
@@ -304,7 +351,8 @@ class UnitTestFSM(unittest.TestCase):
     # Fails as we already have 'Start' state.
     buf = 'Start\n  ^.\n'
     f = io.StringIO(buf)
-    self.assertRaises(textfsm.TextFSMTemplateError, t._ParseFSMState, f)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      t._ParseFSMState(f)
 
     # Remove start so we can test new Start state.
     t.states = {}
@@ -338,15 +386,18 @@ class UnitTestFSM(unittest.TestCase):
     # Malformed states.
     buf = 'St%art\n  ^.\n  ^Hello World\n'
     f = io.StringIO(buf)
-    self.assertRaises(textfsm.TextFSMTemplateError, t._ParseFSMState, f)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      t._ParseFSMState(f)
 
     buf = 'Start\n^.\n  ^Hello World\n'
     f = io.StringIO(buf)
-    self.assertRaises(textfsm.TextFSMTemplateError, t._ParseFSMState, f)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      t._ParseFSMState(f)
 
     buf = '  Start\n  ^.\n  ^Hello World\n'
     f = io.StringIO(buf)
-    self.assertRaises(textfsm.TextFSMTemplateError, t._ParseFSMState, f)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      t._ParseFSMState(f)
 
     # Multiple variables and substitution (depends on _ParseFSMVariables).
     buf = (
@@ -369,48 +420,47 @@ class UnitTestFSM(unittest.TestCase):
     # State name too long (>32 char).
     buf = 'rnametoolong_nametoolong_nametoolong_nametoolong_nametoolo\n  ^.\n\n'
     f = io.StringIO(buf)
-    self.assertRaises(textfsm.TextFSMTemplateError, t._ParseFSMState, f)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      t._ParseFSMState(f)
 
   def testInvalidStates(self):
 
     # 'Continue' should not accept a destination.
-    self.assertRaises(
-        textfsm.TextFSMTemplateError,
-        textfsm.TextFSMRule,
-        '^.* -> Continue Start',
-    )
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      textfsm.TextFSMRule('^.* -> Continue Start')
 
     # 'Error' accepts a text string but "next' state does not.
     self.assertEqual(
         str(textfsm.TextFSMRule('  ^ -> Error "hi there"')),
         '  ^ -> Error "hi there"',
     )
-    self.assertRaises(
-        textfsm.TextFSMTemplateError,
-        textfsm.TextFSMRule,
-        '^.* -> Next "Hello World"',
-    )
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      textfsm.TextFSMRule('^.* -> Next "Hello World"')
 
   def testRuleStartsWithCarrot(self):
 
     f = io.StringIO(
         'Value Beer (.)\nValue Wine (\\w)\n\nStart\n  A Simple line'
     )
-    self.assertRaises(textfsm.TextFSMTemplateError, textfsm.TextFSM, f)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      textfsm.TextFSM(f)
 
   def testValidateFSM(self):
 
     # No Values.
     f = io.StringIO('\nNotStart\n')
-    self.assertRaises(textfsm.TextFSMTemplateError, textfsm.TextFSM, f)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      textfsm.TextFSM(f)
 
     # No states.
     f = io.StringIO('Value unused (.)\n\n')
-    self.assertRaises(textfsm.TextFSMTemplateError, textfsm.TextFSM, f)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      textfsm.TextFSM(f)
 
     # No 'Start' state.
     f = io.StringIO('Value unused (.)\n\nNotStart\n')
-    self.assertRaises(textfsm.TextFSMTemplateError, textfsm.TextFSM, f)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      textfsm.TextFSM(f)
 
     # Has 'Start' state with valid destination
     f = io.StringIO('Value unused (.)\n\nStart\n')
@@ -421,7 +471,8 @@ class UnitTestFSM(unittest.TestCase):
 
     # Invalid destination.
     t.states['Start'].append(textfsm.TextFSMRule('^.* -> bogus'))
-    self.assertRaises(textfsm.TextFSMTemplateError, t._ValidateFSM)
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      t._ValidateFSM()
 
     # Now valid again.
     t.states['bogus'] = []
@@ -460,7 +511,7 @@ class UnitTestFSM(unittest.TestCase):
 
     # Trivial FSM, no records produced.
     tplt = 'Value unused (.)\n\nStart\n  ^Trivial SFM\n'
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
 
     data = 'Non-matching text\nline1\nline 2\n'
     self.assertFalse(t.ParseText(data))
@@ -470,7 +521,7 @@ class UnitTestFSM(unittest.TestCase):
 
     # Simple FSM, One Variable no options.
     tplt = 'Value boo (.*)\n\nStart\n  ^$boo -> Next.Record\n\nEOF\n'
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
 
     # Matching one line.
     # Tests 'Next' & 'Record' actions.
@@ -485,12 +536,8 @@ class UnitTestFSM(unittest.TestCase):
     self.assertListEqual(result, [['Matching text'], ['And again']])
 
     # Two Variables and singular options.
-    tplt = (
-        'Value Required boo (one)\nValue Filldown hoo (two)\n\n'
-        'Start\n  ^$boo -> Next.Record\n  ^$hoo -> Next.Record\n\n'
-        'EOF\n'
-    )
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    tplt = _TWO_VAR_TEMPLATE
+    t = self._GetFSM(tplt)
 
     # Matching two lines. Only one records returned due to 'Required' flag.
     # Tests 'Filldown' and 'Required' options.
@@ -498,21 +545,16 @@ class UnitTestFSM(unittest.TestCase):
     result = t.ParseText(data)
     self.assertListEqual(result, [['one', 'two']])
 
-    t = textfsm.TextFSM(io.StringIO(tplt))
     # Matching two lines. Two records returned due to 'Filldown' flag.
+    # Reset rather than rebuild the FSM before parsing again.
     data = 'two\none\none'
     t.Reset()
     result = t.ParseText(data)
     self.assertListEqual(result, [['one', 'two'], ['one', 'two']])
 
     # Multiple Variables and options.
-    tplt = (
-        'Value Required,Filldown boo (one)\n'
-        'Value Filldown,Required hoo (two)\n\n'
-        'Start\n  ^$boo -> Next.Record\n  ^$hoo -> Next.Record\n\n'
-        'EOF\n'
-    )
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    tplt = _MULTI_VAR_TEMPLATE
+    t = self._GetFSM(tplt)
     data = 'two\none\none'
     result = t.ParseText(data)
     self.assertListEqual(result, [['one', 'two'], ['one', 'two']])
@@ -521,7 +563,7 @@ class UnitTestFSM(unittest.TestCase):
 
     # Trivial FSM, no records produced.
     tplt = 'Value unused (.)\n\nStart\n  ^Trivial SFM\n'
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
 
     data = 'Non-matching text\nline1\nline 2\n'
     self.assertFalse(t.ParseText(data))
@@ -531,7 +573,7 @@ class UnitTestFSM(unittest.TestCase):
 
     # Simple FSM, One Variable no options.
     tplt = 'Value boo (.*)\n\nStart\n  ^$boo -> Next.Record\n\nEOF\n'
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
 
     # Matching one line.
     # Tests 'Next' & 'Record' actions.
@@ -548,12 +590,8 @@ class UnitTestFSM(unittest.TestCase):
     )
 
     # Two Variables and singular options.
-    tplt = (
-        'Value Required boo (one)\nValue Filldown hoo (two)\n\n'
-        'Start\n  ^$boo -> Next.Record\n  ^$hoo -> Next.Record\n\n'
-        'EOF\n'
-    )
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    tplt = _TWO_VAR_TEMPLATE
+    t = self._GetFSM(tplt)
 
     # Matching two lines. Only one records returned due to 'Required' flag.
     # Tests 'Filldown' and 'Required' options.
@@ -561,8 +599,8 @@ class UnitTestFSM(unittest.TestCase):
     result = t.ParseTextToDicts(data)
     self.assertListEqual(result, [{'hoo': 'two', 'boo': 'one'}])
 
-    t = textfsm.TextFSM(io.StringIO(tplt))
     # Matching two lines. Two records returned due to 'Filldown' flag.
+    # Reset rather than rebuild the FSM before parsing again.
     data = 'two\none\none'
     t.Reset()
     result = t.ParseTextToDicts(data)
@@ -571,13 +609,8 @@ class UnitTestFSM(unittest.TestCase):
     )
 
     # Multiple Variables and options.
-    tplt = (
-        'Value Required,Filldown boo (one)\n'
-        'Value Filldown,Required hoo (two)\n\n'
-        'Start\n  ^$boo -> Next.Record\n  ^$hoo -> Next.Record\n\n'
-        'EOF\n'
-    )
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    tplt = _MULTI_VAR_TEMPLATE
+    t = self._GetFSM(tplt)
     data = 'two\none\none'
     result = t.ParseTextToDicts(data)
     self.assertListEqual(
@@ -588,7 +621,7 @@ class UnitTestFSM(unittest.TestCase):
 
     # Simple FSM, One Variable no options.
     tplt = 'Value boo (.*)\n\nStart\n  ^$boo -> Next.Record\n\n'
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
 
     # Null string
     data = ''
@@ -631,7 +664,7 @@ class UnitTestFSM(unittest.TestCase):
         'Start\n  ^$boo -> Next.Record\n  ^$hoo -> Next.Clear'
     )
 
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
     data = 'one\ntwo\nonE\ntwO'
     result = t.ParseText(data)
     self.assertListEqual(result, [['onE', 'two']])
@@ -645,7 +678,7 @@ class UnitTestFSM(unittest.TestCase):
         '  ^$hoo'
     )
 
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
     data = 'one\ntwo'
     result = t.ParseText(data)
     self.assertListEqual(result, [['', 'two']])
@@ -658,7 +691,7 @@ class UnitTestFSM(unittest.TestCase):
         'Start\n  ^$boo -> Continue\n  ^$hoo -> Continue.Record'
     )
 
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
     data = 'one\non0'
     result = t.ParseText(data)
     self.assertListEqual(result, [['one', 'one'], ['on0', 'on0']])
@@ -671,9 +704,10 @@ class UnitTestFSM(unittest.TestCase):
         'Start\n  ^$boo -> Continue\n  ^$hoo -> Error'
     )
 
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
     data = 'one'
-    self.assertRaises(textfsm.TextFSMError, t.ParseText, data)
+    with self.assertRaises(textfsm.TextFSMError):
+      t.ParseText(data)
 
     tplt = (
         'Value Required boo (on.)\n'
@@ -681,8 +715,9 @@ class UnitTestFSM(unittest.TestCase):
         'Start\n  ^$boo -> Continue\n  ^$hoo -> Error "Hello World"'
     )
 
-    t = textfsm.TextFSM(io.StringIO(tplt))
-    self.assertRaises(textfsm.TextFSMError, t.ParseText, data)
+    t = self._GetFSM(tplt)
+    with self.assertRaises(textfsm.TextFSMError):
+      t.ParseText(data)
 
   def testKey(self):
     tplt = (
@@ -704,10 +739,10 @@ class UnitTestFSM(unittest.TestCase):
         'EOF'
     )
 
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
     data = 'one\ntwo\non0\ntw0'
     result = t.ParseText(data)
-    self.assertListEqual(result, [[['one'], 'two'], [['on0'], 'tw0']])
+    self.assertListEqual(result, _LIST_RESULT)
 
     tplt = (
         'Value List,Filldown boo (on.)\n'
@@ -716,17 +751,10 @@ class UnitTestFSM(unittest.TestCase):
         'EOF'
     )
 
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
     data = 'one\non0\non1'
     result = t.ParseText(data)
-    self.assertEqual(
-        result,
-        ([
-            [['one'], 'one'],
-            [['one', 'on0'], 'on0'],
-            [['one', 'on0', 'on1'], 'on1'],
-        ]),
-    )
+    self.assertListEqual(result, _LIST_FILLDOWN_RESULT)
 
     tplt = (
         'Value List,Required boo (on.)\n'
@@ -735,10 +763,10 @@ class UnitTestFSM(unittest.TestCase):
         'EOF'
     )
 
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
     data = 'one\ntwo\ntw2'
     result = t.ParseText(data)
-    self.assertListEqual(result, [[['one'], 'two']])
+    self.assertListEqual(result, _LIST_REQUIRED_RESULT)
 
   def testNestedMatching(self):
     """List-type values with nested regex capture groups are parsed correctly.
@@ -766,17 +794,7 @@ class UnitTestFSM(unittest.TestCase):
     # Julia should be parsed as "name" separately
     data = ' Bob: 32 NC\n Alice: 27 NY\n Jeff: 45 CA\nJulia\n\n'
     result = t.ParseText(data)
-    self.assertListEqual(
-        result,
-        ([[
-            [
-                {'name': 'Bob', 'age': '32', 'state': 'NC'},
-                {'name': 'Alice', 'age': '27', 'state': 'NY'},
-                {'name': 'Jeff', 'age': '45', 'state': 'CA'},
-            ],
-            'Julia',
-        ]]),
-    )
+    self.assertListEqual(result, _NESTED_MATCHING_RESULT)
 
   def testNestedNameConflict(self):
     tplt = (
@@ -788,9 +806,8 @@ class UnitTestFSM(unittest.TestCase):
         '\n  ^'
         r'\s*$$ -> Record'
     )
-    self.assertRaises(
-        textfsm.TextFSMTemplateError, textfsm.TextFSM, io.StringIO(tplt)
-    )
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      textfsm.TextFSM(io.StringIO(tplt))
 
   def testGetValuesByAttrib(self):
 
@@ -808,6 +825,24 @@ class UnitTestFSM(unittest.TestCase):
     result.sort()
     self.assertListEqual(result, ['boo', 'hoo'])
 
+  def testGetValueAfterValuesChange(self):
+    """Values looked up by name follow changes to the values list."""
+
+    tplt = 'Value boo (.)\nValue hoo (.)\n\nStart\n  ^$boo$hoo -> Record\n'
+    t = textfsm.TextFSM(io.StringIO(tplt))
+    boo, hoo = t.values
+    self.assertIs(t._GetValue('hoo'), hoo)
+
+    # Removed values are no longer found.
+    t.values.remove(boo)
+    self.assertIsNone(t._GetValue('boo'))
+    self.assertIs(t._GetValue('hoo'), hoo)
+
+    # Replaced values are found in place of the original.
+    other = copy.copy(hoo)
+    t.values[0] = other
+    self.assertIs(t._GetValue('hoo'), other)
+
   def testStateChange(self):
 
     # Sinple state change, no actions
@@ -816,7 +851,7 @@ class UnitTestFSM(unittest.TestCase):
         'Start\n  ^$boo -> State1\n\nState1\n  ^$hoo -> Start\n\n'
         'EOF'
     )
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
 
     data = 'one'
     t.ParseText(data)
@@ -832,7 +867,7 @@ class UnitTestFSM(unittest.TestCase):
         'State1\n  ^$hoo -> Start\n\n'
         'EOF'
     )
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
 
     data = 'one'
     t.ParseText(data)
@@ -845,7 +880,7 @@ class UnitTestFSM(unittest.TestCase):
 
     # Implicit EOF.
     tplt = 'Value boo (.*)\n\nStart\n  ^$boo -> Next\n'
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
 
     data = 'Matching text'
     result = t.ParseText(data)
@@ -853,14 +888,14 @@ class UnitTestFSM(unittest.TestCase):
 
     # EOF explicitly suppressed in template.
     tplt = 'Value boo (.*)\n\nStart\n  ^$boo -> Next\n\nEOF\n'
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
 
     result = t.ParseText(data)
     self.assertListEqual(result, [])
 
     # Implicit EOF suppressed by argument.
     tplt = 'Value boo (.*)\n\nStart\n  ^$boo -> Next\n'
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
 
     result = t.ParseText(data, eof=False)
     self.assertListEqual(result, [])
@@ -869,7 +904,7 @@ class UnitTestFSM(unittest.TestCase):
 
     # End State, EOF is skipped.
     tplt = 'Value boo (.*)\n\nStart\n  ^$boo -> End\n  ^$boo -> Record\n'
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
     data = 'Matching text A\nMatching text B'
 
     result = t.ParseText(data)
@@ -877,14 +912,14 @@ class UnitTestFSM(unittest.TestCase):
 
     # End State, with explicit Record.
     tplt = 'Value boo (.*)\n\nStart\n  ^$boo -> Record End\n'
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
 
     result = t.ParseText(data)
     self.assertListEqual(result, [['Matching text A']])
 
     # EOF state transition is followed by implicit End State.
     tplt = 'Value boo (.*)\n\nStart\n  ^$boo -> EOF\n  ^$boo -> Record\n'
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
 
     result = t.ParseText(data)
     self.assertListEqual(result, [['Matching text A']])
@@ -892,19 +927,32 @@ class UnitTestFSM(unittest.TestCase):
   def testInvalidRegexp(self):
 
     tplt = 'Value boo (.$*)\n\nStart\n  ^$boo -> Next\n'
-    self.assertRaises(
-        textfsm.TextFSMTemplateError, textfsm.TextFSM, io.StringIO(tplt)
-    )
+    with self.assertRaises(textfsm.TextFSMTemplateError):
+      textfsm.TextFSM(io.StringIO(tplt))
 
   def testValidRegexp(self):
     """RegexObjects uncopyable in Python 2.6."""
 
     tplt = 'Value boo (fo*)\n\nStart\n  ^$boo -> Record\n'
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
     data = 'f\nfo\nfoo\n'
     result = t.ParseText(data)
     self.assertListEqual(result, [['f'], ['fo'], ['foo']])
 
+  def testSharedRuleRegexp(self):
+    """Identical rules across states share one compiled regex."""
+
+    tplt = (
+        'Value boo (fo*)\n\n'
+        'Start\n  ^$boo -> Record\n  ^$$ -> Bar\n\n'
+        'Bar\n  ^$boo -> Record\n  ^$$ -> Start\n'
+    )
+    t = textfsm.TextFSM(io.StringIO(tplt))
+    start, bar = t.states['Start'], t.states['Bar']
+    self.assertIs(start[0].regex_obj, bar[0].regex_obj)
+    self.assertIs(start[1].regex_obj, bar[1].regex_obj)
+    self.assertIsNot(start[0].regex_obj, start[1].regex_obj)
+
   def testReEnteringState(self):
     """Issue 2. TextFSM should leave file pointer at top of template file."""
 
@@ -917,6 +965,28 @@ class UnitTestFSM(unittest.TestCase):
     t = textfsm.TextFSM(tmpl_file)
     t.ParseText(output_text)
 
+  def testDeepCopy(self):
+    tplt = 'Value Filldown boo (.*)\n\nStart\n  ^$boo -> Record\n\nEOF\n'
+    t = textfsm.TextFSM(io.StringIO(tplt))
+    clone = copy.deepcopy(t)
+    self.assertIsNot(t.states, clone.states)
+    self.assertIsNot(t.values[0], clone.values[0])
+    self.assertIs(clone, clone.values[0].fsm)
+    clone.states['Start'].append(t.states['Start'][0])
+    self.assertEqual(1, len(t.states['Start']))
+
+  def testClone(self):
+    tplt = 'Value Filldown boo (.*)\n\nStart\n  ^$boo -> Record\n\nEOF\n'
+    t = textfsm.TextFSM(io.StringIO(tplt))
+    clone = t._Clone()
+    # Parsed rules are shared, the values and their state are not.
+    self.assertIs(t.states, clone.states)
+    self.assertIsNot(t.values[0], clone.values[0])
+    self.assertIs(clone, clone.values[0].fsm)
+    self.assertListEqual(clone.ParseText('one\ntwo'), [['one'], ['two']])
+    self.assertListEqual(t._result, [])
+    self.assertIsNone(t.values[0].value)
+
   def testFillup(self):
     """Fillup should work ok."""
     tplt = """Value Required Col1 ([^-]+)
@@ -934,11 +1004,9 @@ Start
 2 A2 --
 3 -- B3
 """
-    t = textfsm.TextFSM(io.StringIO(tplt))
+    t = self._GetFSM(tplt)
     result = t.ParseText(data)
-    self.assertListEqual(
-        result, [['1', 'A2', 'B1'], ['2', 'A2', 'B3'], ['3', '', 'B3']]
-    )
+    self.assertListEqual(result, _FILLUP_RESULT)
 
 
 class UnitTestUnicode(unittest.TestCase):
@@ -16,6 +16,7 @@
 
 """Unittest for text table."""
 
+import copy
 import io
 import unittest
 from textfsm import terminal
@@ -153,6 +154,10 @@ class UnitTestRow(unittest.TestCase):
     self.assertEqual(['1', 'white', '2', 'yellow', '3'], self.row.values)
     self.assertEqual(1, self.row.index('black'))
     self.assertEqual(2, self.row.index('b'))
+    # Lookups by name follow the shifted columns.
+    self.assertEqual('white', self.row['black'])
+    self.row['b'] = 'blue'
+    self.assertEqual(['1', 'white', 'blue', 'yellow', '3'], self.row.values)
     self.assertRaises(IndexError, self.row.Insert, 'grey', 'gray', 6)
     self.assertRaises(IndexError, self.row.Insert, 'grey', 'gray', -7)
 
@@ -400,6 +405,33 @@ a,b, c, d  # Trim comment
     self.assertEqual(['10', '20', '30'], t3[2].values)
     self.assertEqual(['10', '20', '30'], t3[4].values)
     self.assertEqual(4, t3.size)
+    # Rows are copies, renumbered and owned by the new table.
+    self.assertEqual([1, 2, 3, 4], [row.row for row in t3])
+    self.assertTrue(all(row.table is t3 for row in t3))
+    t3[3]['a'] = 'x'
+    self.assertEqual('1', t2[1]['a'])
+    self.assertEqual('x', t3[3]['a'])
+    # Plain lists are appended as rows.
+    t4 = t + [['4', '5', '6'], ('7', '8', '9')]
+    self.assertEqual(4, t4.size)
+    self.assertEqual(['4', '5', '6'], t4[3].values)
+    self.assertEqual(['7', '8', '9'], t4[4].values)
+    # Subclasses that customise NewRow build every row themselves.
+    class TaggedTable(texttable.TextTable):
+
+      def NewRow(self, value=''):
+        newrow = super(TaggedTable, self).NewRow(value)
+        newrow.tagged = True
+        return newrow
+
+    t5 = TaggedTable()
+    t5.header = ('a', 'b', 'c')
+    t5.Append(('1', '2', '3'))
+    for table in (copy.copy(t5), t5 + t5):
+      self.assertTrue(all(getattr(row, 'tagged', False) for row in table))
+    # Mismatched headers are still rejected.
+    t2.AddColumn('d')
+    self.assertRaises(TypeError, t.__add__, t2)
 
   def testExtendTable(self):
     t2 = self.BasicTable()
@@ -461,6 +493,17 @@ a,b, c, d  # Trim comment
     self.assertEqual(['two', '1', 'three', ''], t[4].values)
     self.assertEqual(4, t.size)
 
+    # List values in key columns are compared rather than hashed.
+    t = texttable.TextTable()
+    t.header = ('a', 'b')
+    t.Append((['1', '2'], '3'))
+    t2 = texttable.TextTable()
+    t2.header = ('a', 'Beer')
+    t2.Append((['1'], 'Ale'))
+    t2.Append((['1', '2'], 'Stout'))
+    t.extend(t2, ('a',))
+    self.assertEqual([['1', '2'], '3', 'Stout'], t[1].values)
+
     # Expects a texttable as the argument.
     self.assertRaises(AttributeError, t.extend, ['a', 'list'])
     # All Key column Names must be valid.
@@ -501,6 +544,7 @@ a,b, c, d  # Trim comment
     self.assertEqual(2, t._SmallestColSize('a bb'))
     self.assertEqual(4, t._SmallestColSize('a cccc bb'))
     self.assertEqual(0, t._SmallestColSize(''))
+    self.assertEqual(0, t._SmallestColSize(' \t'))
     self.assertEqual(1, t._SmallestColSize('a\tb'))
     self.assertEqual(1, t._SmallestColSize('a\nb\tc'))
     self.assertEqual(3, t._SmallestColSize('a\nbbb\n\nc'))
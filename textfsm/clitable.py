@@ -26,12 +26,48 @@ the TextFSM output parser.
 """
 
 import copy
+import functools
+import io
+import operator
 import os
 import re
+import sys
 import threading
 import textfsm
 from textfsm import texttable
 
+# Matches the '[[...]]' completion syntax used in the index 'Command' column.
+_COMPLETION_RE = re.compile(r'(\[\[.+?\]\])')
+
+# Characters with special meaning in a regexp, their absence implies a literal.
+_REGEX_METACHARS = frozenset('.^$*+?{}[]\\|()')
+
+# Upper bound on memoised attribute matches held by each IndexTable.
+_MATCH_CACHE_SIZE = 1024
+
+# Upper bound on compiled templates held by CliTable.
+_TEMPLATE_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=1024)
+def _CompletionRegex(word):
+  """Returns the completion regexp for a word, e.g. 'abc' is '(a(b(c)?)?)?'."""
+  return '(' + ('(').join(word) + ')?' * len(word)
+
+
+# Indexes share many patterns, e.g. '.*' or a vendor name, so compile each once.
+@functools.lru_cache(maxsize=1024)
+def _CompileRegex(pattern):
+  """Compiles an index regexp, shared by every row and index that holds it.
+
+  Args:
+    pattern: String, the regexp to compile.
+
+  Returns:
+    A compiled re.Pattern object.
+  """
+  return re.compile(pattern)
+
 
 class Error(Exception):
   """Base class for errors."""
@@ -52,9 +88,14 @@ class IndexTable(object):
 
   Includes functions to preprocess Columns (both compiled and uncompiled).
 
+  GetRowMatch works from a per-column index of the compiled table, built once
+  when the index file is parsed, and memoises its results. So the compiled
+  table must not be modified after construction, as changes would not be seen.
+
   Attributes:
     index: TextTable, the index file parsed into a texttable.
     compiled: TextTable, the table but with compiled regexp for each field.
+      Read only once constructed.
   """
 
   def __init__(self, preread=None, precompile=None, file_path=None):
@@ -67,16 +108,14 @@ class IndexTable(object):
     """
     self.index = None
     self.compiled = None
+    # Per column, bitmaps of the rows grouped by the pattern they hold.
+    self._column_index = {}
+    # Bitmap of matching rows, keyed by (column, attribute value).
+    self._match_cache = {}
     if file_path:
       self._index_file = file_path
-      self._index_handle = open(self._index_file, 'r')
       self._ParseIndex(preread, precompile)
 
-  def __del__(self):
-    """Close index handle."""
-    if hasattr(self, '_index_handle'):
-      self._index_handle.close()
-
   def __len__(self):
     """Returns number of rows in table."""
     return self.index.size
@@ -87,22 +126,30 @@ class IndexTable(object):
     if hasattr(self, '_index_file'):
       # pylint: disable=protected-access
       clone._index_file = self._index_file
-      clone._index_handle = self._index_handle
 
     clone.index = self.index
     clone.compiled = self.compiled
+    # pylint: disable=protected-access
+    clone._column_index = self._column_index
+    clone._match_cache = self._match_cache
     return clone
 
   def __deepcopy__(self, memodict=None):
-    """Returns a deepcopy of an IndexTable object."""
+    """Returns a deepcopy of an IndexTable object.
+
+    The compiled table holds only immutable regexp objects and is not modified
+    after parsing, so it is shared with the clone rather than copied.
+    """
     clone = IndexTable()
     if hasattr(self, '_index_file'):
       # pylint: disable=protected-access
       clone._index_file = copy.deepcopy(self._index_file)
-      clone._index_handle = open(clone._index_file, 'r')
 
-    clone.index = copy.deepcopy(self.index)
-    clone.compiled = copy.deepcopy(self.compiled)
+    clone.index = copy.deepcopy(self.index, memodict)
+    clone.compiled = self.compiled
+    # pylint: disable=protected-access
+    clone._column_index = self._column_index
+    clone._match_cache = self._match_cache
     return clone
 
   def _ParseIndex(self, preread, precompile):
@@ -118,7 +165,10 @@ class IndexTable(object):
       IndexTableError: If the column headers has illegal column labels.
     """
     self.index = texttable.TextTable()
-    self.index.CsvToTable(self._index_handle)
+    # The file is read only once, copies share the parsed tables rather than
+    # re-reading it.
+    with open(self._index_file, 'r') as index_handle:
+      self.index.CsvToTable(index_handle)
 
     if preread:
       for row in self.index:
@@ -132,26 +182,87 @@ class IndexTable(object):
         if precompile:
           row[col] = precompile(col, row[col])
         if row[col]:
-          row[col] = re.compile(row[col])
+          row[col] = _CompileRegex(row[col])
+
+    self._BuildColumnIndex()
+
+  def _BuildColumnIndex(self):
+    """Groups the rows of each column by the pattern they hold.
+
+    For each column, rows are grouped into bitmaps: those that are empty
+    (and so always match), those per literal pattern, and those per distinct
+    true regexp. Each distinct pattern is then matched once per value, rather
+    than once per row that holds it.
+    """
+    self._column_index = {}
+    for col in self.compiled.header:
+      empty = 0
+      literals = {}
+      regexps = {}
+      for row in self.compiled:
+        bit = 1 << row.row
+        pattern = row[col]
+        if not pattern:
+          empty |= bit
+        elif _REGEX_METACHARS.intersection(pattern.pattern):
+          regexps[pattern] = regexps.get(pattern, 0) | bit
+        else:
+          literals[pattern.pattern] = literals.get(pattern.pattern, 0) | bit
+      lengths = sorted(set(len(literal) for literal in literals))
+      self._column_index[col] = (
+          empty, literals, lengths, tuple(regexps.items())
+      )
+
+  def _MatchingRows(self, key, value):
+    """Returns a bitmap of the rows whose column matches the value.
+
+    Bit N is set if row N has an empty entry for the column, or an entry that
+    matches the value. Results are memoised, as the same attribute values tend
+    to be queried repeatedly.
+
+    Args:
+      key: String, the column name.
+      value: String, the attribute value to match against the column.
+
+    Returns:
+      Integer bitmap of matching row numbers.
+    """
+    cache_key = (key, value)
+    rows = self._match_cache.get(cache_key)
+    if rows is not None:
+      return rows
+
+    rows, literals, lengths, regexps = self._column_index[key]
+    # A regexp match is anchored only at the start of the string, so a
+    # literal pattern matches any value it is a prefix of.
+    for length in lengths:
+      rows |= literals.get(value[:length], 0)
+    for pattern, pattern_rows in regexps:
+      if pattern.match(value):
+        rows |= pattern_rows
+
+    if len(self._match_cache) >= _MATCH_CACHE_SIZE:
+      self._match_cache.clear()
+    self._match_cache[cache_key] = rows
+    return rows
 
   def GetRowMatch(self, attributes):
     """Returns the row number that matches the supplied attributes."""
-    for row in self.compiled:
-      try:
-        for key in attributes:
-          # Silently skip attributes not present in the index file.
-          # pylint: disable=E1103
-          if (
-              key in row.header
-              and row[key]
-              and not row[key].match(attributes[key])
-          ):
-            # This line does not match, so break and try next row.
-            raise StopIteration()
-        return row.row
-      except StopIteration:
-        pass
-    return 0
+    rows = None
+    for key in attributes:
+      # Silently skip attributes not present in the index file.
+      if key not in self.compiled.header:
+        continue
+      matched = self._MatchingRows(key, attributes[key])
+      rows = matched if rows is None else rows & matched
+      if not rows:
+        return 0
+
+    if rows is None:
+      # Nothing to match against, so the first row matches (if there is one).
+      return 1 if self.compiled.size else 0
+    # The lowest set bit is the first matching row.
+    return (rows & -rows).bit_length() - 1
 
 
 class CliTable(texttable.TextTable):
@@ -172,8 +283,13 @@ class CliTable(texttable.TextTable):
 
   # Parse each template index only once across all instances.
   # Without this, the regexes are parsed at every call to CliTable().
+  # Keyed by index path, plus the pre-processing methods if a subclass
+  # overrides them.
   _lock = threading.Lock()
   INDEX = {}
+  # Likewise each template file is compiled only once, keyed by file path.
+  # Guarded by the same lock.
+  _TEMPLATES = {}
 
   def synchronised(func):
     """Synchronisation decorator."""
@@ -205,6 +321,22 @@ class CliTable(texttable.TextTable):
     if index_file:
       self.ReadIndex(index_file)
 
+  def __deepcopy__(self, memodict=None):
+    """Returns a deepcopy of a CliTable object.
+
+    The index is shared by every CliTable built from the same index file (see
+    INDEX), so the clone shares it too rather than copying it.
+    """
+    if memodict is None:
+      memodict = {}
+    clone = self.__class__.__new__(self.__class__)
+    memodict[id(self)] = clone
+    if self.index is not None:
+      memodict[id(self.index)] = self.index
+    for attr, value in self.__dict__.items():
+      setattr(clone, attr, copy.deepcopy(value, memodict))
+    return clone
+
   def ReadIndex(self, index_file=None):
     """Reads the IndexTable index file of commands and templates.
 
@@ -217,11 +349,19 @@ class CliTable(texttable.TextTable):
 
     self.index_file = index_file or self.index_file
     fullpath = os.path.join(self.template_dir, self.index_file)
-    if self.index_file and fullpath not in self.INDEX:
+    key = fullpath
+    cls = type(self)
+    if (
+        cls._PreParse is not CliTable._PreParse
+        or cls._PreCompile is not CliTable._PreCompile
+    ):
+      # Subclasses may pre-process the index differently, so key on those too.
+      key = (fullpath, cls._PreParse, cls._PreCompile)
+    if self.index_file and key not in self.INDEX:
       self.index = IndexTable(self._PreParse, self._PreCompile, fullpath)
-      self.INDEX[fullpath] = self.index
+      self.INDEX[key] = self.index
     else:
-      self.index = self.INDEX[fullpath]
+      self.index = self.INDEX[key]
 
     # Does the IndexTable have the right columns.
     if 'Template' not in self.index.index.header:  # pylint: disable=E1103
@@ -275,7 +415,12 @@ class CliTable(texttable.TextTable):
       # Re-initialise the table.
       self.Reset()
       self._keys = set()
-      self.table = self._ParseCmdItem(self.raw, template_file=template_files[0])
+      # The parsed table is private to this call, so adopt its rows directly
+      # rather than deep copying them via the 'table' property.
+      parsed = self._ParseCmdItem(self.raw, template_file=template_files[0])
+      self._table = parsed._table  # pylint: disable=protected-access
+      for row in self:
+        row.table = self
 
       # Add additional columns from any additional tables.
       for tmplt in template_files[1:]:
@@ -300,7 +445,7 @@ class CliTable(texttable.TextTable):
       CliTableError: A template was not found for the given command.
     """
     # Build FSM machine from the template.
-    fsm = textfsm.TextFSM(template_file)
+    fsm = self._CompileTemplate(template_file)
     if not self._keys:
       self._keys = set(fsm.GetValuesByAttrib('Key'))
 
@@ -313,10 +458,48 @@ class CliTable(texttable.TextTable):
       table.Append(record)
     return table
 
+  def _CompileTemplate(self, template_file):
+    """Returns a TextFSM for the template, reusing any earlier compilation.
+
+    Compiled templates are cached by absolute file path and invalidated when the
+    file's modification time or size changes. Templates without a path or an underlying file
+    descriptor are always compiled.
+
+    Args:
+      template_file: File object, template to compile.
+
+    Returns:
+      A TextFSM object private to the caller.
+    """
+    path = getattr(template_file, 'name', None)
+    if not isinstance(path, str):
+      return textfsm.TextFSM(template_file)
+
+    try:
+      stat = os.fstat(template_file.fileno())
+    except (AttributeError, OSError, io.UnsupportedOperation):
+      # Named but not backed by a file descriptor, so cannot be cached.
+      return textfsm.TextFSM(template_file)
+    # Relative paths change meaning with the working directory.
+    path = os.path.abspath(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with self._lock:
+      cached = self._TEMPLATES.get(path)
+    if cached is None or cached[0] != signature:
+      cached = (signature, textfsm.TextFSM(template_file))
+      with self._lock:
+        if path not in self._TEMPLATES:
+          while len(self._TEMPLATES) >= _TEMPLATE_CACHE_SIZE:
+            # Evict the least recently added template.
+            del self._TEMPLATES[next(iter(self._TEMPLATES))]
+        self._TEMPLATES[path] = cached
+    # The FSM holds parsing state so callers each get their own copy.
+    return cached[1]._Clone()  # pylint: disable=protected-access
+
   def _PreParse(self, key, value):
     """Executed against each field of each row read from index table."""
     if key == 'Command':
-      return re.sub(r'(\[\[.+?\]\])', self._Completion, value)
+      return _COMPLETION_RE.sub(self._Completion, value)
     else:
       return value
 
@@ -341,7 +524,7 @@ class CliTable(texttable.TextTable):
     """
     # Strip the outer '[[' & ']]' and replace with ()? regexp pattern.
     word = str(match.group())[2:-2]
-    return '(' + ('(').join(word) + ')?' * len(word)
+    return _CompletionRegex(word)
 
   def LabelValueTable(self, keys=None):
     """Return LabelValue with FSM derived keys."""
@@ -353,7 +536,13 @@ class CliTable(texttable.TextTable):
   def sort(self, cmp=None, key=None, reverse=False):
     """Overrides sort func to use the KeyValue for the key."""
     if not key and self._keys:
-      key = self.KeyValue
+      superkey = self.superkey
+      if superkey:
+        # Equivalent to KeyValue, but with column positions resolved once.
+        getter = operator.itemgetter(*[self.header.index(k) for k in superkey])
+        key = lambda row: getter(row.values)
+      else:
+        key = self.KeyValue
     super(CliTable, self).sort(cmp=cmp, key=key, reverse=reverse)
 
   # pylint: enable=W0622
@@ -377,16 +566,15 @@ class CliTable(texttable.TextTable):
       if keyname not in self.header:
         raise KeyError("'%s'" % keyname)
 
-    self._keys = self._keys.union(set(key_list))
+    # Interned keys let superkey membership tests compare by identity.
+    self._keys = self._keys.union(
+        sys.intern(key) if isinstance(key, str) else key for key in key_list
+    )
 
   @property
   def superkey(self):
     """Returns a set of column names that together constitute the superkey."""
-    sorted_list = []
-    for header in self.header:
-      if header in self._keys:
-        sorted_list.append(header)
-    return sorted_list
+    return [header for header in self.header if header in self._keys]
 
   def KeyValue(self, row=None):
     """Returns the super key value for the row."""
@@ -396,12 +584,10 @@ class CliTable(texttable.TextTable):
         row = self[self._iterator]
       else:
         row = self.row
+    # Derive the superkey once rather than per column.
+    superkey = self.superkey
     # If no superkey then use row number.
-    if not self.superkey:
+    if not superkey:
       return ['%s' % row.row]
 
-    sorted_list = []
-    for header in self.header:
-      if header in self.superkey:
-        sorted_list.append(row[header])
-    return sorted_list
+    return row[superkey]
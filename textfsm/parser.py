@@ -25,6 +25,7 @@ parse a specific type of text input, returning a record of values
 for each input entity.
 """
 
+import copy
 import getopt
 import inspect
 import re
@@ -362,7 +363,11 @@ class TextFSMValue(object):
 
 
 class CopyableRegexObject(object):
-  """Like a re.RegexObject, but can be copied."""
+  """Like a re.RegexObject, but can be copied.
+
+  No longer used internally, compiled regexps are copyable in Python 3. Kept
+  for compatibility with code that references it.
+  """
 
   def __init__(self, pattern):
     self.pattern = pattern
@@ -425,14 +430,17 @@ class TextFSMRule(object):
   ACTION2_RE = re.compile(r'\s+%s(\s+%s)?$' % (RECORD_OP_RE, NEWSTATE_RE))
   # Default operators with optional new state.
   ACTION3_RE = re.compile(r'(\s+%s)?$' % (NEWSTATE_RE))
+  # A new state must start with an alphanumeric character.
+  STATE_NAME_RE = re.compile(r'\w+')
 
-  def __init__(self, line, line_num=-1, var_map=None):
+  def __init__(self, line, line_num=-1, var_map=None, regex_cache=None):
     """Initialise a new rule object.
 
     Args:
       line: (str), a template rule line to parse.
       line_num: (int), Optional line reference included in error reporting.
       var_map: Map for template (${var}) substitutions.
+      regex_cache: Optional dict of compiled regexes, keyed by pattern.
 
     Raises:
       TextFSMTemplateError: If 'line' is not a valid format for a Value entry.
@@ -458,9 +466,9 @@ class TextFSMRule(object):
     else:
       self.match = line
 
-    # Replace ${varname} entries.
+    # Replace ${varname} entries, if there are any.
     self.regex = self.match
-    if var_map:
+    if var_map and '$' in self.match:
       try:
         self.regex = string.Template(self.match).substitute(var_map)
       except (ValueError, KeyError) as exc:
@@ -470,8 +478,12 @@ class TextFSMRule(object):
         ) from exc
 
     try:
-      # Work around a regression in Python 2.6 that makes RE Objects uncopyable.
-      self.regex_obj = CopyableRegexObject(self.regex)
+      if regex_cache is None:
+        self.regex_obj = re.compile(self.regex)
+      else:
+        self.regex_obj = regex_cache.get(self.regex)
+        if self.regex_obj is None:
+          self.regex_obj = regex_cache[self.regex] = re.compile(self.regex)
     except re.error as exc:
       raise TextFSMTemplateError(
           "Invalid regular expression: '%s'. Line: %s."
@@ -519,7 +531,7 @@ class TextFSMRule(object):
 
     # Check that an error message is present only with the 'Error' operator.
     if self.line_op != 'Error' and self.new_state:
-      if not re.match(r'\w+', self.new_state):
+      if not self.STATE_NAME_RE.match(self.new_state):
         raise TextFSMTemplateError(
             'Alphanumeric characters only in state names. Line: %s.'
             % (self.line_num)
@@ -562,6 +574,9 @@ class TextFSM(object):
   MAX_NAME_LEN = 48
   comment_regex = re.compile(r'^\s*#')
   state_name_re = re.compile(r'^(\w+)$')
+  # Classifies a line within a state as a comment or a rule in one pass.
+  # A rule starts with 1 or 2 spaces, or a tab, followed by a carat.
+  rule_line_re = re.compile(r'(?P<comment>\s*#)|(?P<rule>(?: {1,2}|\t)\^)')
   _DEFAULT_OPTIONS = TextFSMOptions
 
   def __init__(self, template, options_class=_DEFAULT_OPTIONS):
@@ -573,12 +588,16 @@ class TextFSM(object):
     self.state_list = []
     self.values = []
     self.value_map = {}
+    # Position of each Value in values by name, for assigning matched groups.
+    self._value_names = {}
     # Track where we are for error reporting.
     self._line_num = 0
     # Run FSM in this state
     self._cur_state = None
     # Name of the current state.
     self._cur_state_name = None
+    # Compiled rule regexes, so identical rules share one pattern object.
+    self._regex_cache = {}
 
     # Read and parse FSM definition.
     # Restore the file pointer once done.
@@ -586,10 +605,33 @@ class TextFSM(object):
       self._Parse(template)
     finally:
       template.seek(0)
+      self._regex_cache = None
 
     # Initialise starting data.
     self.Reset()
 
+  def _Clone(self):
+    """Returns a copy of the FSM that shares the parsed template.
+
+    Cheaper than a deepcopy for callers that only parse with the copy. The
+    states and their rules are shared with the clone, so must not be modified.
+    The values, which hold the parsing state, are copied and refer back to the
+    clone.
+
+    Returns:
+      A TextFSM object.
+    """
+    memodict = {}
+    clone = self.__class__.__new__(self.__class__)
+    memodict[id(self)] = clone
+    shared = [self.states, self.state_list, self.value_map]
+    shared.extend(self.states.values())
+    for obj in shared:
+      memodict[id(obj)] = obj
+    for attr, value in self.__dict__.items():
+      setattr(clone, attr, copy.deepcopy(value, memodict))
+    return clone
+
   def __str__(self):
     """Returns the FSM template, mimicing the input file."""
 
@@ -632,8 +674,18 @@ class TextFSM(object):
 
   def _GetValue(self, name):
     """Returns the TextFSMValue object natching the requested name."""
+    index = self._value_names.get(name)
+    if index is not None and index < len(self.values):
+      value = self.values[index]
+      if value.name == name:
+        return value
+    # Not a Value, or values were changed after parsing.
     for value in self.values:
       if value.name == name:
+        # Reindex, keeping the first Value of each name as the scan does.
+        self._value_names = {}
+        for index, other in enumerate(self.values):
+          self._value_names.setdefault(other.name, index)
         return value
 
   def _AppendRecord(self):
@@ -704,6 +756,7 @@ class TextFSM(object):
     """
 
     self.values = []
+    self._value_names = {}
 
     for line in template:
       self._line_num += 1
@@ -744,6 +797,7 @@ class TextFSM(object):
               '%s Line %s.' % (exc, self._line_num)
           ) from exc
 
+        self._value_names[value.name] = len(self.values)
         self.values.append(value)
         self.value_map[value.name] = value.template
       # The line has text but without the 'Value ' prefix.
@@ -823,18 +877,19 @@ class TextFSM(object):
         break
       if not isinstance(line, str):
         line = line.decode('utf-8')
-      if self.comment_regex.match(line):
-        continue
-
-      # A rule within a state, starts with 1 or 2 spaces, or a tab.
-      if not line.startswith((' ^', '  ^', '\t^')):
+      line_type = self.rule_line_re.match(line)
+      if line_type is None:
         raise TextFSMTemplateError(
             "Missing white space or carat ('^') before rule. Line: %s"
             % self._line_num
         )
+      if line_type.lastgroup == 'comment':
+        continue
 
       self.states[state_name].append(
-          TextFSMRule(line, self._line_num, self.value_map)
+          TextFSMRule(
+              line, self._line_num, self.value_map, self._regex_cache
+          )
       )
 
     return state_name
@@ -955,7 +1010,8 @@ class TextFSM(object):
     for rule in self._cur_state:
       matched = self._CheckRule(rule, line)
       if matched:
-        for value in matched.groupdict():
+        # Group names come from the pattern, no need to build a groupdict.
+        for value in matched.re.groupindex:
           self._AssignVar(matched, value)
 
         if self._Operations(rule, line):
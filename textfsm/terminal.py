@@ -17,6 +17,7 @@
 
 """Simple terminal related routines."""
 
+import functools
 import getopt
 import re
 import shutil
@@ -125,13 +126,30 @@ def _AnsiCmd(command_list):
   """
   if not isinstance(command_list, list):
     raise ValueError('Invalid list: %s' % command_list)
+  return _AnsiSequence(tuple(command_list))
+
+
+# Few distinct SGR combinations are in use, so build each sequence only once.
+@functools.lru_cache(maxsize=256)
+def _AnsiSequence(command_tuple):
+  """Formats a tuple of SGR values as an ANSI escape sequence.
+
+  Args:
+    command_tuple: Tuple of strings, each string represents an SGR value.
+
+  Returns:
+    The ANSI escape sequence.
+
+  Raises:
+    ValueError: if a member of command_tuple does not map to a valid SGR value.
+  """
   # Checks that entries are valid SGR names.
   # No checking is done for sequences that are correct but 'nonsensical'.
-  for sgr in command_list:
+  for sgr in command_tuple:
     if sgr.lower() not in SGR:
       raise ValueError('Invalid or unsupported SGR name: %s' % sgr)
   # Convert to numerical strings.
-  command_str = [str(SGR[x.lower()]) for x in command_list]
+  command_str = [str(SGR[x.lower()]) for x in command_tuple]
   # Wrap values in Ansi escape sequence (CSI prefix & SGR suffix).
   return '\033[%sm' % ';'.join(command_str)
 
@@ -155,14 +173,24 @@ def AnsiText(text, command_list=None, reset=True):
     return '%s%s' % (_AnsiCmd(command_list), text)
 
 
+def _EncloseSgr(match):
+  """Returns the matched ANSI/SGR escape sequence within start/end hints."""
+  return ANSI_START + match.group(1) + ANSI_END
+
+
 def StripAnsiText(text):
   """Strip ANSI/SGR escape sequences from text."""
+  # Most text has no escape sequences, a substring test is cheaper than a sub.
+  if '\033' not in text:
+    return text
   return sgr_re.sub('', text)
 
 
 def EncloseAnsiText(text):
   """Enclose ANSI/SGR escape sequences with ANSI_START and ANSI_END."""
-  return sgr_re.sub(lambda x: ANSI_START + x.group(1) + ANSI_END, text)
+  if '\033' not in text:
+    return text
+  return sgr_re.sub(_EncloseSgr, text)
 
 
 def LineWrap(text, omit_sgr=False):
@@ -177,34 +205,50 @@ def LineWrap(text, omit_sgr=False):
   """
 
   def _SplitWithSgr(text_line, width):
-    """Tokenise the line so that the sgr sequences can be omitted."""
-    token_list = sgr_re.split(text_line)
-    text_line_list = []
+    """Tokenise the line so that the sgr sequences can be omitted.
+
+    Args:
+      text_line: String, a single line of text to wrap.
+      width: Integer, the maximum visible characters per line.
+
+    Returns:
+      A list of the wrapped lines.
+    """
+    line_list = []
+    token_list = []
     line_length = 0
-    for index, token in enumerate(token_list):
+    # As in StripAnsiText, only tokenise lines that hold an escape sequence.
+    if '\033' in text_line:
+      tokens = sgr_re.split(text_line)
+    else:
+      tokens = [text_line]
+    for index, token in enumerate(tokens):
       # Skip null tokens.
       if not token:
         continue
 
-      if sgr_re.match(token):
+      # The split pattern has one group, so sgr sequences are the odd tokens.
+      if index % 2:
         # Add sgr escape sequences without splitting or counting length.
-        text_line_list.append(token)
-        text_line = ''.join(token_list[index + 1 :])
-      else:
-        if line_length + len(token) <= width:
-          # Token fits in line and we count it towards overall length.
-          text_line_list.append(token)
-          line_length += len(token)
-          text_line = ''.join(token_list[index + 1 :])
-        else:
-          # Line splits part way through this token.
-          # So split the token, form a new line and carry the remainder.
-          text_line_list.append(token[: width - line_length])
-          text_line = token[width - line_length :]
-          text_line += ''.join(token_list[index + 1 :])
-          break
-
-    return (''.join(text_line_list), text_line)
+        token_list.append(token)
+        continue
+
+      # Line splits part way through this token.
+      # So split the token, form a new line and carry the remainder.
+      while line_length + len(token) > width:
+        token_list.append(token[: width - line_length])
+        line_list.append(''.join(token_list))
+        token = token[width - line_length :]
+        token_list = []
+        line_length = 0
+
+      # Token fits in line and we count it towards overall length.
+      token_list.append(token)
+      line_length += len(token)
+
+    if token_list:
+      line_list.append(''.join(token_list))
+    return line_list
 
   # We don't use textwrap library here as it insists on removing
   # trailing/leading whitespace (pre 2.6).
@@ -212,22 +256,36 @@ def LineWrap(text, omit_sgr=False):
   text = str(text)
   text_multiline = []
   for text_line in text.splitlines():
-    # Is this a line that needs splitting?
-    while (omit_sgr and (len(StripAnsiText(text_line)) > term_width)) or (
-        len(text_line) > term_width
-    ):
+    if omit_sgr:
+      text_multiline.extend(_SplitWithSgr(text_line, term_width))
+    else:
       # If there are no sgr escape characters then do a straight split.
-      if not omit_sgr:
-        text_multiline.append(text_line[:term_width])
-        text_line = text_line[term_width:]
-      else:
-        (multiline_line, text_line) = _SplitWithSgr(text_line, term_width)
-        text_multiline.append(multiline_line)
-    if text_line:
-      text_multiline.append(text_line)
+      text_multiline.extend(
+          text_line[i : i + term_width]
+          for i in range(0, len(text_line), term_width)
+      )
   return '\n'.join(text_multiline)
 
 
+# Only the progress percentage varies, so each prompt is built only once.
+@functools.lru_cache(maxsize=128)
+def _PagerPrompt(progress_text):
+  """Returns the pager's prompt and the string that erases it.
+
+  Args:
+    progress_text: String, progress indication appended to the prompt.
+
+  Returns:
+    A tuple of the coloured prompt string and the string to overwrite it with.
+  """
+  question = AnsiText(
+      'Enter: next line, Space: next page, b: prev page, q: quit.%s'
+      % progress_text,
+      ['green'],
+  )
+  return question, '\r%s\r' % (' ' * len(question))
+
+
 class Pager(object):
   """A simple text pager module.
 
@@ -269,6 +327,11 @@ class Pager(object):
         for more obvious scrolling.
     """
     self._text = text or ''
+    # Line wrapped copy of the complete lines at the start of the text, and
+    # the terminal width they were wrapped to.
+    self._wrapped_text = ''
+    self._wrapped_lines = []
+    self._wrapped_width = None
     self._delay = delay
     try:
       self._tty = open('/dev/tty')
@@ -301,6 +364,10 @@ class Pager(object):
     """
 
     (self._cli_cols, self._cli_lines) = shutil.get_terminal_size()
+    # The terminal may have been resized, so wrap the text afresh.
+    self._wrapped_text = ''
+    self._wrapped_lines = []
+    self._wrapped_width = None
 
     if lines:
       self._cli_lines = int(lines)
@@ -333,8 +400,11 @@ class Pager(object):
     if show_percent is None:
       show_percent = text is None
     self._show_percent = show_percent
+    if show_percent:
+      # Counted once here rather than on every prompt.
+      self._text_lines = len(self._text.splitlines())
 
-    text = LineWrap(self._text).splitlines()
+    text = self._WrappedLines()
     while True:
       # Get a list of new lines to display.
       self._newlines = text[
@@ -368,6 +438,36 @@ class Pager(object):
 
     return True
 
+  def _WrappedLines(self):
+    """Returns the text as a list of wrapped lines.
+
+    Lines wrapped on earlier calls are reused, so text fed in incrementally is
+    only wrapped once. Only complete lines are kept, as a trailing partial line
+    may yet be extended. The lines are wrapped afresh if the terminal width
+    changes.
+
+    Returns:
+      A list of strings, the lines to display. Not to be modified.
+    """
+    (width, _) = shutil.get_terminal_size()
+    if (
+        width != self._wrapped_width
+        or not self._text.startswith(self._wrapped_text)
+    ):
+      # Resized, or the text was replaced rather than appended to.
+      self._wrapped_text = ''
+      self._wrapped_lines = []
+      self._wrapped_width = width
+    end = self._text.rfind('\n') + 1
+    if end > len(self._wrapped_text):
+      self._wrapped_lines.extend(
+          LineWrap(self._text[len(self._wrapped_text) : end]).splitlines()
+      )
+      self._wrapped_text = self._text[:end]
+    if end == len(self._text):
+      return self._wrapped_lines
+    return self._wrapped_lines + LineWrap(self._text[end:]).splitlines()
+
   def _Scroll(self, lines=None):
     """Set attributes to scroll the buffer correctly.
 
@@ -396,19 +496,15 @@ class Pager(object):
       A string, the character entered by the user.
     """
     if self._show_percent:
-      progress = int(self._displayed * 100 / (len(self._text.splitlines())))
+      progress = int(self._displayed * 100 / self._text_lines)
       progress_text = ' (%d%%)' % progress
     else:
       progress_text = ''
-    question = AnsiText(
-        'Enter: next line, Space: next page, b: prev page, q: quit.%s'
-        % progress_text,
-        ['green'],
-    )
+    question, erase = _PagerPrompt(progress_text)
     sys.stdout.write(question)
     sys.stdout.flush()
     ch = self._GetCh()
-    sys.stdout.write('\r%s\r' % (' ' * len(question)))
+    sys.stdout.write(erase)
     sys.stdout.flush()
     return ch
 
@@ -25,10 +25,69 @@ formats such as CSV and variable sized and justified rows.
 
 import copy
 import functools
+import sys
 import textwrap
 
 from textfsm import terminal
 
+# Cell values up to this length are interned, as short values such as states,
+# vendors and column names tend to recur across many rows.
+_INTERN_MAX_LEN = 32
+
+
+def _Intern(value):
+  """Returns the interned string if it is short enough, the value otherwise."""
+  if isinstance(value, str) and len(value) <= _INTERN_MAX_LEN:
+    return sys.intern(value)
+  return value
+
+
+@functools.lru_cache(maxsize=64)
+def _TextWrapper(width):
+  """Returns a TextWrapper for the width, shared as it holds no wrap state."""
+  return textwrap.TextWrapper(
+      width=width, break_long_words=False, expand_tabs=False
+  )
+
+
+def _CopyValues(values):
+  """Returns a copy of a row's values, deep only where they are mutable."""
+  # Cells are nearly always strings, which need no copying.
+  if all(isinstance(value, str) for value in values):
+    return list(values)
+  return copy.deepcopy(values)
+
+
+# Tables tend to repeat the same short cells, such as states and flags.
+@functools.lru_cache(maxsize=4096)
+def _JustifyText(text, col_size):
+  """Returns text wrapped and padded to the column size, see _TextJustify."""
+  if '\n' in text:
+    result = []
+    for paragraph in text.split('\n'):
+      result.extend(_JustifyText(paragraph, col_size))
+    return tuple(result)
+
+  try:
+    text_list = _TextWrapper(col_size - 2).wrap(text)
+  except ValueError as exc:
+    raise TableError('Field too small (minimum width: 3)') from exc
+
+  if not text_list:
+    return (' ' * col_size,)
+
+  result = []
+  for current_line in text_list:
+    stripped_len = len(terminal.StripAnsiText(current_line))
+    ansi_color_adds = len(current_line) - stripped_len
+    # +2 for white space on either side.
+    if stripped_len + 2 > col_size:
+      raise TableError('String contains words that do not fit in column.')
+
+    result.append(' %-*s' % (col_size - 1 + ansi_color_adds, current_line))
+
+  return tuple(result)
+
 
 class Error(Exception):
   """Base class for errors."""
@@ -63,9 +122,7 @@ class Row(dict):
 
   def _BuildIndex(self):
     """Recreate the key index."""
-    self._index = {}
-    for i, k in enumerate(self._keys):
-      self._index[k] = i
+    self._index = {k: i for i, k in enumerate(self._keys)}
 
   def __getitem__(self, column):
     """Support for [] notation.
@@ -81,15 +138,16 @@ class Row(dict):
       IndexError: The given column(s) were not found.
     """
     if isinstance(column, (list, tuple)):
-      ret = []
-      for col in column:
-        ret.append(self[col])
-      return ret
+      return [self[col] for col in column]
 
+    # Look up by name without raising, as positional lookups are common too.
     try:
-      return self._values[self._index[column]]
-    except (KeyError, TypeError, ValueError):
-      pass
+      i = self._index.get(column)
+    except TypeError:
+      # Unhashable, such as a slice on older Pythons.
+      i = None
+    if i is not None:
+      return self._values[i]
 
     # Perhaps we have a range like '1', ':-1' or '1:'.
     try:
@@ -103,14 +161,20 @@ class Row(dict):
     return value in self._values
 
   def __setitem__(self, column, value):
-    for i in range(len(self)):
-      if self._keys[i] == column:
-        self._values[i] = value
-        return
+    try:
+      i = self._index[column]
+    except (KeyError, TypeError):
+      i = None
+    if i is not None:
+      if len(self._index) != len(self._keys):
+        # Duplicate keys, the index holds the last but we set the first.
+        i = self._keys.index(column)
+      self._values[i] = value
+      return
     # No column found, add a new one.
     self._keys.append(column)
     self._values.append(value)
-    self._BuildIndex()
+    self._index[column] = len(self._keys) - 1
 
   def __iter__(self):
     return iter(self._values)
@@ -191,8 +255,7 @@ class Row(dict):
     if self._values and len(values) != len(self._values):
       raise ValueError('Header values not equal to existing data width.')
     if not self._values:
-      for _ in range(len(values)):
-        self._values.append(None)
+      self._values = [None] * len(values)
     self._keys = list(values)
     self._BuildIndex()
 
@@ -231,19 +294,22 @@ class Row(dict):
 
     def _ToStr(value):
       """Convert individul list entries to string."""
+      # Values from TextFSM are already strings, skip the conversion.
+      if type(value) is str:  # pylint: disable=unidiomatic-typecheck
+        return _Intern(value)
       if isinstance(value, (list, tuple)):
         result = []
         for val in value:
-          result.append(str(val))
+          result.append(_Intern(str(val)))
         return result
       else:
-        return str(value)
+        return _Intern(str(value))
 
     # Row with identical header can be copied directly.
     if isinstance(values, Row):
       if self._keys != values.header:
         raise TypeError('Attempt to append row with mismatched header.')
-      self._values = copy.deepcopy(values.values)
+      self._values = _CopyValues(values.values)
 
     elif isinstance(values, dict):
       for key in self._keys:
@@ -280,14 +346,21 @@ class Row(dict):
     if not 0 <= row_index < len(self):
       raise IndexError('Index "%s" is out of bounds.' % row_index)
 
-    new_row = Row()
-    for idx in self.header:
-      if self.index(idx) == row_index:
-        new_row[key] = value
-      new_row[idx] = self[idx]
-    self._keys = new_row.header
-    self._values = new_row.values
-    del new_row
+    if key not in self._index and len(self._index) == len(self._keys):
+      # A new column amongst unique ones, splice it in directly.
+      self._keys = self._keys[:row_index] + [key] + self._keys[row_index:]
+      self._values = (
+          self._values[:row_index] + [value] + self._values[row_index:]
+      )
+    else:
+      new_row = Row()
+      for idx in self.header:
+        if self.index(idx) == row_index:
+          new_row[key] = value
+        new_row[idx] = self[idx]
+      self._keys = new_row.header
+      self._values = new_row.values
+      del new_row
     self._BuildIndex()
 
   color = property(_GetColour, _SetColour, doc='Colour spec of this row')
@@ -360,8 +433,7 @@ class TextTable(object):
     """Merges two with identical columns."""
 
     new_table = copy.copy(self)
-    for row in other:
-      new_table.Append(row)
+    new_table._AppendRows(other)
 
     return new_table
 
@@ -371,10 +443,46 @@ class TextTable(object):
     new_table = self.__class__()
     # pylint: disable=protected-access
     new_table._table = [self.header]
-    for row in self[1:]:
-      new_table.Append(row)
+    new_table._AppendRows(self[1:])
     return new_table
 
+  def _AppendRows(self, rows):
+    """Appends copies of rows, as per Append.
+
+    Row() objects with the same header as the table are copied directly rather
+    than populated column by column. Anything else goes through Append.
+
+    Args:
+      rows: Iterable of Row(), dict, list or tuple entries.
+
+    Raises:
+      TableError: Supplied tuple not equal to table width.
+      TypeError: A row's header does not match the table's.
+    """
+    # pylint: disable=protected-access
+    header = self._Header()
+    keys = header._keys
+    if (
+        len(header._index) != len(keys)
+        or self.row_class is not Row
+        or type(self).Append is not TextTable.Append
+        or type(self).NewRow is not TextTable.NewRow
+    ):
+      # Duplicate column names, or customised row handling, leave it to Append.
+      keys = None
+
+    for row in rows:
+      if keys is None or not isinstance(row, Row) or row._keys != keys:
+        self.Append(row)
+        continue
+      newrow = self.row_class()
+      newrow.row = self.size + 1
+      newrow.table = self
+      newrow._keys = list(keys)
+      newrow._index = dict(header._index)
+      newrow._values = _CopyValues(row._values)
+      self._table.append(newrow)
+
   def Filter(self, function=None):
     """Construct Textable from the rows of which the function returns true.
 
@@ -436,12 +544,13 @@ class TextTable(object):
     def _DefaultKey(value):
       """Default key func is to create a list of all fields."""
       result = []
-      for key in self.header:
+      # Row values are held in header order, so read them positionally.
+      for field in value.values:
         # Try sorting as numerical value if possible.
         try:
-          result.append(float(value[key]))
+          result.append(float(field))
         except ValueError:
-          result.append(value[key])
+          result.append(field)
       return result
 
     key = key or _DefaultKey
@@ -498,15 +607,39 @@ class TextTable(object):
           row1[column] = row2[column]
       return
 
-    for row1 in self:
+    keys = tuple(keys)
+    # Map each key to the first matching row of 'table', rather than scanning
+    # 'table' once for every row of this one.
+    try:
+      matches = {}
       for row2 in table:
-        for k in keys:
-          if row1[k] != row2[k]:
-            break
-        else:
-          for column in extend_with:
-            row1[column] = row2[column]
+        matches.setdefault(tuple(row2[k] for k in keys), row2)
+    except TypeError:
+      # List values are unhashable, fall back to comparing row by row.
+      matches = None
+
+    for row1 in self:
+      if matches is None:
+        row2 = self._FindRow(table, row1, keys)
+      else:
+        try:
+          row2 = matches.get(tuple(row1[k] for k in keys))
+        except TypeError:
+          row2 = self._FindRow(table, row1, keys)
+      if row2 is not None:
+        for column in extend_with:
+          row1[column] = row2[column]
+
+  @staticmethod
+  def _FindRow(table, row, keys):
+    """Returns the first row in table whose keys match those of row, or None."""
+    for candidate in table:
+      for k in keys:
+        if row[k] != candidate[k]:
           break
+      else:
+        return candidate
+    return None
 
   def Remove(self, row):
     """Removes a row from the table.
@@ -574,6 +707,7 @@ class TextTable(object):
     row = self.row_class()
     row.row = 0
     for v in new_values:
+      v = _Intern(v)
       row[v] = v
     self._table[0] = row
 
@@ -599,13 +733,11 @@ class TextTable(object):
       The whole table including headers as a string. Each row is
       joined by a newline and each entry by self.separator.
     """
-    result = []
-    # Avoid the global lookup cost on each iteration.
-    lstr = str
-    for row in self._table:
-      result.append('%s\n' % self.separator.join(lstr(v) for v in row))
-
-    return ''.join(result)
+    separator = self.separator
+    # Joining a map over the value list avoids a generator per row.
+    return ''.join(
+        [separator.join(map(str, row.values)) + '\n' for row in self._table]
+    )
 
   def _SetTable(self, table):
     """Sets table, with column headers and separators."""
@@ -632,7 +764,7 @@ class TextTable(object):
     if not text:
       return 0
     stripped = terminal.StripAnsiText(text)
-    return max(len(word) for word in stripped.split())
+    return max(map(len, stripped.split()), default=0)
 
   def _TextJustify(self, text, col_size):
     """Formats text within column with white space padding.
@@ -654,33 +786,7 @@ class TextTable(object):
     Raises:
       TableError: If col_size is too small to fit the words in the text.
     """
-    result = []
-    if '\n' in text:
-      for paragraph in text.split('\n'):
-        result.extend(self._TextJustify(paragraph, col_size))
-      return result
-
-    wrapper = textwrap.TextWrapper(
-        width=col_size - 2, break_long_words=False, expand_tabs=False
-    )
-    try:
-      text_list = wrapper.wrap(text)
-    except ValueError as exc:
-      raise TableError('Field too small (minimum width: 3)') from exc
-
-    if not text_list:
-      return [' ' * col_size]
-
-    for current_line in text_list:
-      stripped_len = len(terminal.StripAnsiText(current_line))
-      ansi_color_adds = len(current_line) - stripped_len
-      # +2 for white space on either side.
-      if stripped_len + 2 > col_size:
-        raise TableError('String contains words that do not fit in column.')
-
-      result.append(' %-*s' % (col_size - 1 + ansi_color_adds, current_line))
-
-    return result
+    return list(_JustifyText(text, col_size))
 
   def FormattedTable(
       self,
@@ -710,11 +816,11 @@ class TextTable(object):
       TableError: Width too narrow to display table.
     """
 
-    def _FilteredCols():
-      """Returns list of column names to display."""
-      if not columns:
-        return self._Header().values
-      return [col for col in self._Header().values if col in columns]
+    # Column names to display, fetched once as they are consulted per cell.
+    if columns:
+      filtered_cols = [col for col in self._Header().values if col in columns]
+    else:
+      filtered_cols = list(self._Header().values)
 
     # Largest is the biggest data entry in a column.
     largest = {}
@@ -723,7 +829,7 @@ class TextTable(object):
     smallest = {}
     # largest == smallest for a column with a single word of data.
     # Initialise largest and smallest for all columns.
-    for key in _FilteredCols():
+    for key in filtered_cols:
       largest[key] = 0
       smallest[key] = 0
 
@@ -731,9 +837,8 @@ class TextTable(object):
     # Include Title line in equation.
     # pylint: disable=E1103
     for row in self._table:
-      for key, value in row.items():
-        if key not in _FilteredCols():
-          continue
+      for key in filtered_cols:
+        value = row[key]
         # Convert lists into a string.
         if isinstance(value, list):
           value = ', '.join(value)
@@ -747,7 +852,7 @@ class TextTable(object):
     # Bump up the size of each column to include minimum pad.
     # Find all columns that can be wrapped (multi-line).
     # And the minimum width needed to display all columns (even if wrapped).
-    for key in _FilteredCols():
+    for key in filtered_cols:
       # Each column is bracketed by a space on both sides.
       # So increase size required accordingly.
       largest[key] += 2
@@ -813,7 +918,7 @@ class TextTable(object):
     # Format the header lines and add to result_dict.
     # Find what the total width will be and use this for the ruled lines.
     # Find how many rows are needed for the most wrapped line (row_count).
-    for key in _FilteredCols():
+    for key in filtered_cols:
       result_dict[key] = self._TextJustify(key, smallest[key])
       if len(result_dict[key]) > row_count:
         row_count = len(result_dict[key])
@@ -822,7 +927,7 @@ class TextTable(object):
     # Store header in header_list, working down the wrapped rows.
     header_list = []
     for row_idx in range(row_count):
-      for key in _FilteredCols():
+      for key in filtered_cols:
         try:
           header_list.append(result_dict[key][row_idx])
         except IndexError:
@@ -839,9 +944,8 @@ class TextTable(object):
     first_line = True
     for row in self:
       row_count = 0
-      for key, value in row.items():
-        if key not in _FilteredCols():
-          continue
+      for key in filtered_cols:
+        value = row[key]
         # Convert field contents to a string.
         if isinstance(value, list):
           value = ', '.join(value)
@@ -861,7 +965,7 @@ class TextTable(object):
 
       row_list = []
       for row_idx in range(row_count):
-        for key in _FilteredCols():
+        for key in filtered_cols:
           try:
             row_list.append(result_dict[key][row_idx])
           except IndexError:
@@ -918,20 +1022,25 @@ class TextTable(object):
 
     label_str = '# LABEL %s\n' % '.'.join(sorted_list)
 
+    # Resolve label and value column positions once, rather than per row.
+    label_cols = []
+    value_cols = []
+    for index, key in enumerate(self._Header().values):
+      if key in sorted_list:
+        label_cols.append(index)
+      else:
+        value_cols.append((index, key))
+
     body = []
     for row in self:
+      values = row.values
       # Some row values are pulled into the label, stored in label_prefix.
-      label_prefix = []
-      value_list = []
-      for key, value in row.items():
-        if key in sorted_list:
-          # Set prefix.
-          label_prefix.append(value)
-        else:
-          value_list.append('%s %s' % (key, value))
-
+      label_prefix = '.'.join([values[index] for index in label_cols])
       body.append(
-          ''.join(['%s.%s\n' % ('.'.join(label_prefix), v) for v in value_list])
+          ''.join([
+              '%s.%s %s\n' % (label_prefix, key, values[index])
+              for index, key in value_cols
+          ])
       )
 
     return '%s%s' % (label_str, ''.join(body))
@@ -955,8 +1064,16 @@ class TextTable(object):
     Raises:
       IndexError: The specified column does not exist.
     """
+    try:
+      # Find the column's position once, rather than per row.
+      col_index = self.header.index(column)
+    except ValueError:
+      for row in self._table[1:]:
+        if row[column] == value:
+          return row
+      return None
     for row in self._table[1:]:
-      if row[column] == value:
+      if row.values[col_index] == value:
         return row
     return None
 